@@ -1,39 +1,116 @@
 """Minimal local test: chunk a text file and get embeddings from the service."""
 
+import array
+import base64
+import http.client
 import json
 import os
+import queue
 import sys
-import urllib.error
-import urllib.request
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 URL = "http://localhost:8000/v1/embeddings"
 CHUNK_SIZE = 1000
+BATCH_SIZE = 32  # texts per request, matches the service's EMBED_BATCH_SIZE
+MAX_IN_FLIGHT = 8  # concurrent requests
 
 
 def chunk_text(text, max_chars=CHUNK_SIZE):
-    """Split text into chunks of roughly max_chars, breaking at whitespace."""
+    """Split text into chunks of roughly max_chars, breaking at whitespace.
+
+    Walks start/end offsets over the text instead of re-slicing the
+    remainder after every chunk, so the text is copied only once.
+    """
     chunks = []
-    while len(text) > max_chars:
-        # Find the last space or newline within the limit
-        break_at = text.rfind(" ", 0, max_chars)
+    start, end = 0, len(text)
+    while end - start > max_chars:
+        # Find the last space within the limit
+        break_at = text.rfind(" ", start, start + max_chars)
         if break_at == -1:
-            break_at = max_chars
-        chunks.append(text[:break_at].strip())
-        text = text[break_at:].strip()
-    if text:
-        chunks.append(text.strip())
+            break_at = start + max_chars
+        lo, hi = start, break_at
+        while lo < hi and text[lo].isspace():
+            lo += 1
+        while hi > lo and text[hi - 1].isspace():
+            hi -= 1
+        if hi > lo:
+            chunks.append(text[lo:hi])
+        # Strip the remainder on both ends before measuring it again
+        start = break_at
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        chunks.append(text[start:end])
     return chunks
 
 
-def get_embedding(text):
-    """Send a single text to the embedding service and return the vector."""
-    body = json.dumps({"input": text}).encode()
-    req = urllib.request.Request(
-        URL, data=body, headers={"Content-Type": "application/json"}
-    )
-    with urllib.request.urlopen(req) as resp:
-        data = json.loads(resp.read())
-    return data["data"][0]["embedding"]
+# Keep-alive connections shared by all threads: each request takes an idle
+# connection (or opens a new one) and returns it to the pool when done
+_URL_PARTS = urllib.parse.urlsplit(URL)
+_idle_connections = queue.SimpleQueue()
+
+
+def _acquire_connection():
+    try:
+        return _idle_connections.get_nowait()
+    except queue.Empty:
+        return http.client.HTTPConnection(_URL_PARTS.hostname, _URL_PARTS.port)
+
+
+def close_connections():
+    """Close all idle pooled connections."""
+    while True:
+        try:
+            _idle_connections.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+def get_embeddings(texts):
+    """Send a list of texts to the embedding service and return the vectors.
+
+    Vectors are requested base64-encoded (raw little-endian float32) and
+    decoded into array.array('f') objects.
+    """
+    body = json.dumps({"input": texts, "encoding_format": "base64"}).encode()
+    headers = {"Content-Type": "application/json"}
+    conn = _acquire_connection()
+    try:
+        try:
+            conn.request("POST", _URL_PARTS.path, body, headers)
+            resp = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server dropped the idle keep-alive connection; reconnect once
+            conn.close()
+            conn.request("POST", _URL_PARTS.path, body, headers)
+            resp = conn.getresponse()
+        payload = resp.read()
+    except BaseException:
+        conn.close()
+        raise
+    _idle_connections.put(conn)
+    if resp.status != 200:
+        raise http.client.HTTPException(f"HTTP {resp.status}: {payload.decode()}")
+    data = json.loads(payload)
+    return [
+        _decode_embedding(item["embedding"])
+        for item in sorted(data["data"], key=lambda d: d["index"])
+    ]
+
+
+def _decode_embedding(encoded):
+    """Decode a base64 little-endian float32 vector."""
+    vec = array.array("f", base64.b64decode(encoded))
+    if sys.byteorder == "big":
+        vec.byteswap()
+    return vec
 
 
 def main():
@@ -48,23 +125,29 @@ def main():
     chunks = chunk_text(text)
     print(f"Split into {len(chunks)} chunks (max {CHUNK_SIZE} chars each)\n")
 
-    for i, chunk in enumerate(chunks, 1):
+    # Embed all chunks up front, BATCH_SIZE chunks per request
+    batches = [chunks[i:i + BATCH_SIZE] for i in range(0, len(chunks), BATCH_SIZE)]
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as executor:
+            embeddings = [
+                emb for batch in executor.map(get_embeddings, batches) for emb in batch
+            ]
+    except (OSError, http.client.HTTPException) as e:
+        print(
+            f"\nERROR: Could not connect to {URL}\n"
+            f"  {e}\n\n"
+            "Is the embedding service running? Start it with:\n"
+            "  uv run uvicorn embed_provider.api:app --port 8000",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    finally:
+        close_connections()
+
+    for i, (chunk, emb) in enumerate(zip(chunks, embeddings), 1):
         preview = chunk[:60].replace("\n", " ")
         print(f'Chunk {i} ({len(chunk)} chars):')
         print(f'  "{preview}..."')
-
-        try:
-            emb = get_embedding(chunk)
-        except urllib.error.URLError as e:
-            print(
-                f"\nERROR: Could not connect to {URL}\n"
-                f"  {e}\n\n"
-                "Is the embedding service running? Start it with:\n"
-                "  uv run uvicorn embed_provider.api:app --port 8000",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
         first5 = [round(v, 4) for v in emb[:5]]
         print(f"  -> Embedding dim: {len(emb)}, first values: {first5}\n")
 
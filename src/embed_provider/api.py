@@ -2,31 +2,50 @@
 
 from __future__ import annotations
 
+import base64
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Any, AsyncIterator
 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 from embed_provider import config
 from embed_provider.model import EmbeddingModel
 from embed_provider.schemas import (
-    EmbeddingItem,
     EmbeddingsRequest,
     EmbeddingsResponse,
+    UsageInfo,
 )
 
 _model: EmbeddingModel | None = None
 
 
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, which formats floats in C and
+    serializes NumPy arrays natively."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Load the embedding model once at startup."""
     global _model  # noqa: PLW0603
     _model = EmbeddingModel()
+    if _model.compiled:
+        # Trigger compilation now rather than on the first request
+        _model.embed_many(["warmup"] * 4)
     yield
 
 
-app = FastAPI(title="Embedding Service", lifespan=lifespan)
+app = FastAPI(
+    title="Embedding Service",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 @app.get("/health")
@@ -39,33 +58,44 @@ async def health() -> dict[str, str]:
     }
 
 
-@app.post("/v1/embeddings", response_model=EmbeddingsResponse)
-async def create_embeddings(request: EmbeddingsRequest) -> EmbeddingsResponse:
+@app.post(
+    "/v1/embeddings",
+    response_class=ORJSONResponse,
+    responses={200: {"model": EmbeddingsResponse}},
+)
+async def create_embeddings(request: EmbeddingsRequest) -> ORJSONResponse:
+    """Embed the input texts.
+
+    The response follows ``EmbeddingsResponse`` but is built as a plain dict
+    and rendered by orjson straight from the NumPy rows, skipping pydantic
+    response validation over every float.
+    """
     assert _model is not None
 
-    texts: list[str]
-    if isinstance(request.input, str):
-        texts = [request.input]
+    texts = request.input
+    if len(texts) == 1:
+        # Single inputs (typically search queries) go through the LRU cache
+        embeddings = _model.embed_one(texts[0])[np.newaxis]
     else:
-        texts = request.input
-
-    if len(texts) == 0:
-        raise HTTPException(status_code=400, detail="Input list must not be empty.")
-
-    for i, t in enumerate(texts):
-        if t == "":
-            raise HTTPException(
-                status_code=400, detail=f"Input string at index {i} must not be empty."
-            )
-
-    embeddings = _model.embed_many(texts)
-
-    data = [
-        EmbeddingItem(index=i, embedding=emb)
-        for i, emb in enumerate(embeddings)
-    ]
-
-    return EmbeddingsResponse(
-        data=data,
-        model=config.MODEL_ID,
+        embeddings = _model.embed_many(texts)
+
+    if request.encoding_format == "base64":
+        # Little-endian float32 bytes, as in the OpenAI API
+        encoded = [
+            base64.b64encode(emb.astype("<f4", copy=False).tobytes()).decode()
+            for emb in embeddings
+        ]
+    else:
+        encoded = list(embeddings)
+
+    return ORJSONResponse(
+        content={
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": emb}
+                for i, emb in enumerate(encoded)
+            ],
+            "model": config.MODEL_ID,
+            "usage": UsageInfo().model_dump(),
+        }
     )
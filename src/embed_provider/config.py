@@ -11,7 +11,10 @@ def _parse_bool(value: str) -> bool:
 
 MODEL_ID: str = os.getenv("EMBED_MODEL_ID", "intfloat/multilingual-e5-base")
 DEVICE: str = os.getenv("EMBED_DEVICE", "auto")
+DTYPE: str = os.getenv("EMBED_DTYPE", "auto")
 NORMALIZE: bool = _parse_bool(os.getenv("EMBED_NORMALIZE", "true"))
 BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+CACHE_SIZE: int = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
 HF_HOME: str | None = os.getenv("HF_HOME")
 E5_MODE: str = os.getenv("EMBED_E5_MODE", "passage")
+COMPILE: bool = _parse_bool(os.getenv("EMBED_COMPILE", "false"))
@@ -2,12 +2,23 @@
 
 from __future__ import annotations
 
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
 from embed_provider import config
-from embed_provider.device import resolve_device
+from embed_provider.device import resolve_device, resolve_dtype
 
 VALID_E5_MODES = ("passage", "query", "none")
+COMPILE_DEVICES = ("cuda",)
+
+# Process-wide LRU cache for embed_one, keyed by everything that affects the
+# output: (text, e5_mode, normalize, dtype, model_id).
+_cache: OrderedDict[tuple[str, str, bool, str, str], np.ndarray] = OrderedDict()
+_cache_lock = threading.Lock()
 
 
 def _prefix_texts(texts: list[str], e5_mode: str) -> list[str]:
@@ -26,30 +37,77 @@ class EmbeddingModel:
         self,
         model_id: str = config.MODEL_ID,
         device: str = config.DEVICE,
+        dtype: str = config.DTYPE,
         normalize: bool = config.NORMALIZE,
         e5_mode: str = config.E5_MODE,
         batch_size: int = config.BATCH_SIZE,
+        compile_model: bool = config.COMPILE,
+        cache_size: int = config.CACHE_SIZE,
     ) -> None:
         if e5_mode not in VALID_E5_MODES:
             raise ValueError(
                 f"Invalid e5_mode '{e5_mode}'. Choose from: {', '.join(VALID_E5_MODES)}."
             )
+        self.model_id = model_id
         self.device = resolve_device(device)
+        self.dtype = resolve_dtype(dtype, self.device)
         self.normalize = normalize
         self.e5_mode = e5_mode
         self.batch_size = batch_size
+        self.cache_size = cache_size
         self.model = SentenceTransformer(model_id, device=self.device)
+        if self.dtype != torch.float32:
+            self.model.to(self.dtype)
+        # On CUDA, torch.compile fuses the transformer's kernels (dynamic=True
+        # since sequence lengths vary); other devices run eagerly. The
+        # backbone's forward is replaced in place: sentence-transformers
+        # either calls the module or looks up its forward method directly,
+        # and both reach the instance attribute.
+        self.compiled = compile_model and self.device in COMPILE_DEVICES
+        if self.compiled:
+            backbone = self.model[0].auto_model
+            backbone.forward = torch.compile(
+                backbone.forward, mode="reduce-overhead", dynamic=True
+            )
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """Encode a single text and return a 1-D float32 array.
 
-    def embed_one(self, text: str) -> list[float]:
-        """Encode a single text and return a list of floats."""
-        return self.embed_many([text])[0]
+        Results are kept in an LRU cache of ``cache_size`` entries, so a
+        repeated text skips the forward pass. Cached arrays are read-only.
+        """
+        if self.cache_size <= 0:
+            return self.embed_many([text])[0]
 
-    def embed_many(self, texts: list[str]) -> list[list[float]]:
-        """Encode a batch of texts and return a list of float lists."""
+        key = (text, self.e5_mode, self.normalize, str(self.dtype), self.model_id)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+                return cached
+
+        embedding = self.embed_many([text])[0]
+        embedding.setflags(write=False)
+        with _cache_lock:
+            _cache[key] = embedding
+            while len(_cache) > self.cache_size:
+                _cache.popitem(last=False)
+        return embedding
+
+    def embed_many(self, texts: list[str]) -> np.ndarray:
+        """Encode a batch of texts and return a 2-D float32 array (one row per text)."""
         prefixed = _prefix_texts(texts, self.e5_mode)
-        embeddings = self.model.encode(
-            prefixed,
-            normalize_embeddings=self.normalize,
-            batch_size=self.batch_size,
-        )
-        return embeddings.tolist()
+        # encode() already sorts texts by length before batching (and restores
+        # the input order), so each batch is padded only to similar lengths
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                prefixed,
+                batch_size=self.batch_size,
+            )
+        # Half-precision models still return float32; normalize after the
+        # cast so vectors are unit length to float32 precision
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
@@ -2,22 +2,46 @@
 
 from __future__ import annotations
 
-from typing import Literal
+from typing import Annotated, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, WithJsonSchema, field_validator
+
+
+NonEmptyStr = Annotated[str, Field(min_length=1)]
+
+# Accepts a string or a list of strings (as documented in the schema); a
+# single string is wrapped into a list before validation, so the non-empty
+# checks run inside pydantic-core.
+InputTexts = Annotated[
+    list[NonEmptyStr],
+    Field(min_length=1),
+    WithJsonSchema(
+        {
+            "anyOf": [
+                {"type": "string", "minLength": 1},
+                {"type": "array", "items": {"type": "string", "minLength": 1}, "minItems": 1},
+            ]
+        }
+    ),
+]
 
 
 class EmbeddingsRequest(BaseModel):
     model: str | None = None
-    input: str | list[str]
+    input: InputTexts
     encoding_format: Literal["float", "base64"] | None = None
     user: str | None = None
 
+    @field_validator("input", mode="before")
+    @classmethod
+    def _wrap_single_input(cls, value: object) -> object:
+        return [value] if isinstance(value, str) else value
+
 
 class EmbeddingItem(BaseModel):
     object: Literal["embedding"] = "embedding"
     index: int
-    embedding: list[float]
+    embedding: list[float] | str
 
 
 class UsageInfo(BaseModel):
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+import base64
 import math
 import os
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 
@@ -35,6 +37,41 @@ def client():
         yield c
 
 
+# ---------------------------------------------------------------------------
+# Device / dtype resolution tests
+# ---------------------------------------------------------------------------
+
+
+class TestResolveDtype:
+    def test_auto_uses_float32_on_cpu(self):
+        import torch
+
+        from embed_provider.device import resolve_dtype
+
+        assert resolve_dtype("auto", "cpu") == torch.float32
+
+    def test_auto_uses_float16_on_accelerators(self):
+        import torch
+
+        from embed_provider.device import resolve_dtype
+
+        assert resolve_dtype("auto", "cuda") == torch.float16
+        assert resolve_dtype("auto", "mps") == torch.float16
+
+    def test_explicit_dtype(self):
+        import torch
+
+        from embed_provider.device import resolve_dtype
+
+        assert resolve_dtype(" BFloat16 ", "cpu") == torch.bfloat16
+
+    def test_invalid_dtype_raises(self):
+        from embed_provider.device import resolve_dtype
+
+        with pytest.raises(ValueError):
+            resolve_dtype("int8", "cpu")
+
+
 # ---------------------------------------------------------------------------
 # Model wrapper tests
 # ---------------------------------------------------------------------------
@@ -44,19 +81,31 @@ def client():
 class TestModelWrapper:
     """Tests that exercise the SentenceTransformer model directly."""
 
-    def test_embed_one_returns_list_of_floats(self, model):
+    def test_embed_one_returns_float32_array(self, model):
         result = model.embed_one("Hello world")
-        assert isinstance(result, list)
-        assert all(isinstance(v, float) for v in result)
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == np.float32
+        assert result.ndim == 1
 
     def test_embed_one_dimension(self, model):
         result = model.embed_one("Hello world")
         assert len(result) == EXPECTED_DIM
 
+    def test_embed_one_unit_length(self, model):
+        result = model.embed_one("Hello world")
+        assert float(np.linalg.norm(result)) == pytest.approx(1.0, abs=1e-5)
+
     def test_embed_one_no_nans(self, model):
         result = model.embed_one("Hello world")
         assert not any(math.isnan(v) for v in result)
 
+    def test_embed_one_is_cached_and_read_only(self, model):
+        first = model.embed_one("cache me")
+        second = model.embed_one("cache me")
+        assert second is first
+        assert not first.flags.writeable
+        np.testing.assert_allclose(first, model.embed_many(["cache me"])[0], rtol=1e-5)
+
     def test_embed_many_returns_correct_count(self, model):
         texts = ["first sentence", "second sentence"]
         results = model.embed_many(texts)
@@ -65,10 +114,41 @@ class TestModelWrapper:
     def test_embed_many_each_correct_dimension(self, model):
         texts = ["first sentence", "second sentence"]
         results = model.embed_many(texts)
+        assert isinstance(results, np.ndarray)
+        assert results.dtype == np.float32
         for emb in results:
             assert len(emb) == EXPECTED_DIM
-            assert isinstance(emb, list)
-            assert all(isinstance(v, float) for v in emb)
+
+
+@skip_model
+class TestCompile:
+    def test_compiled_backbone_runs_on_forward(self, monkeypatch):
+        import embed_provider.model as model_module
+
+        # Compilation is CUDA-only in production; allow CPU to exercise it
+        monkeypatch.setattr(model_module, "COMPILE_DEVICES", ("cpu",))
+        compiled = model_module.EmbeddingModel(
+            device="cpu", dtype="float32", compile_model=True, cache_size=0
+        )
+        backbone = compiled.model[0]
+        assert compiled.compiled
+        assert "auto_model" not in backbone._modules
+
+        auto_model = backbone.auto_model
+        compiled_forward = auto_model.forward
+        assert "forward" in vars(auto_model)
+        assert hasattr(compiled_forward, "_torchdynamo_orig_callable")
+
+        calls = []
+
+        def spy(*args, **kwargs):
+            calls.append(1)
+            return compiled_forward(*args, **kwargs)
+
+        monkeypatch.setattr(auto_model, "forward", spy)
+        result = compiled.embed_many(["Hello world"])
+        assert calls
+        assert result.shape == (1, EXPECTED_DIM)
 
 
 # ---------------------------------------------------------------------------
@@ -110,22 +190,43 @@ class TestEmbeddingsEndpoint:
             assert item["index"] == i
             assert len(item["embedding"]) == EXPECTED_DIM
 
+    def test_float_encoding_returns_list_of_floats(self, client):
+        resp = client.post(
+            "/v1/embeddings", json={"input": "Hello", "encoding_format": "float"}
+        )
+        assert resp.status_code == 200
+        embedding = resp.json()["data"][0]["embedding"]
+        assert isinstance(embedding, list)
+        assert all(isinstance(v, float) for v in embedding)
+
+    def test_base64_encoding_matches_float(self, client):
+        texts = ["Hello", "World"]
+        floats = client.post("/v1/embeddings", json={"input": texts}).json()
+        encoded = client.post(
+            "/v1/embeddings", json={"input": texts, "encoding_format": "base64"}
+        ).json()
+        for f_item, b_item in zip(floats["data"], encoded["data"]):
+            assert isinstance(b_item["embedding"], str)
+            decoded = np.frombuffer(base64.b64decode(b_item["embedding"]), dtype="<f4")
+            assert decoded.shape == (EXPECTED_DIM,)
+            np.testing.assert_allclose(decoded, f_item["embedding"], rtol=1e-6)
+
     def test_model_field_in_response(self, client):
         resp = client.post("/v1/embeddings", json={"input": "test"})
         body = resp.json()
         assert "model" in body
         assert isinstance(body["model"], str)
 
-    def test_empty_list_returns_400(self, client):
+    def test_empty_list_returns_422(self, client):
         resp = client.post("/v1/embeddings", json={"input": []})
-        assert resp.status_code == 400
+        assert resp.status_code == 422
 
-    def test_empty_string_returns_400(self, client):
+    def test_empty_string_returns_422(self, client):
         resp = client.post("/v1/embeddings", json={"input": ""})
-        assert resp.status_code == 400
+        assert resp.status_code == 422
 
-    def test_list_with_empty_string_returns_400(self, client):
+    def test_list_with_empty_string_returns_422(self, client):
         resp = client.post(
             "/v1/embeddings", json={"input": ["hello", ""]}
         )
-        assert resp.status_code == 400
+        assert resp.status_code == 422